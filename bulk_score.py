@@ -0,0 +1,379 @@
+"""
+Offline bulk NSFW scorer for local directories and manifest files
+
+Decodes images in a process pool, runs batched inference with NSFWDetector and
+streams results to JSONL or Parquet. The output doubles as the checkpoint:
+re-running the same command skips every image already scored (use
+--overwrite to start from scratch). Images that failed to load are retried
+on resume, and the newer row for a path supersedes the older error row.
+
+Usage:
+    python bulk_score.py /data/images --output scores.jsonl
+    python bulk_score.py manifest.txt --output scores/ --format parquet --workers 8
+
+Manifests are either one path per line (blank lines and # comments ignored)
+or JSONL with a "path" key. Relative paths are resolved against the manifest's
+directory. Malformed manifest lines are logged with their line number and
+skipped. Parquet output requires `pip install pyarrow`.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from PIL import Image
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+# Input discovery
+def iter_directory(root: Path) -> Iterator[str]:
+    """Yield image paths under `root` in a stable order"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if Path(filename).suffix.lower() in config.BULK_IMAGE_EXTENSIONS:
+                yield os.path.join(dirpath, filename)
+
+
+def iter_manifest(manifest: Path) -> Iterator[str]:
+    """Yield image paths listed in a manifest file"""
+    base_dir = manifest.parent
+    with open(manifest, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                try:
+                    path = json.loads(line)["path"]
+                except (json.JSONDecodeError, KeyError, TypeError) as e:
+                    logger.warning(f"{manifest}:{line_number}: skipping malformed manifest line ({e!r})")
+                    continue
+                if not isinstance(path, str):
+                    logger.warning(f"{manifest}:{line_number}: skipping manifest line, \"path\" is not a string")
+                    continue
+            else:
+                path = line
+            yield path if os.path.isabs(path) else str(base_dir / path)
+
+
+def iter_inputs(source: Path) -> Iterator[str]:
+    if source.is_dir():
+        return iter_directory(source)
+    if source.is_file():
+        return iter_manifest(source)
+    raise FileNotFoundError(f"Input not found: {source}")
+
+
+def iter_pending(paths: Iterator[str], completed: Set[str]) -> Iterator[str]:
+    """Drop paths already scored, and repeats of a path within this run"""
+    seen = set()
+    for path in paths:
+        if path in completed or path in seen:
+            continue
+        seen.add(path)
+        yield path
+
+
+# Decoding (runs in worker processes)
+def decode_image(path: str) -> Tuple[str, Optional[Image.Image], Optional[str]]:
+    """Load and downscale one image; errors are returned, not raised"""
+    try:
+        size = (config.BULK_DECODE_MAX_DIMENSION, config.BULK_DECODE_MAX_DIMENSION)
+        with Image.open(path) as image:
+            image.draft("RGB", size)
+            image = image.convert("RGB")
+        image.thumbnail(size)
+        return path, image, None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def iter_decoded(executor: ProcessPoolExecutor, paths: Iterator[str], max_pending: int) -> Iterator[Tuple[str, Optional[Image.Image], Optional[str]]]:
+    """Decode in the pool with at most `max_pending` images in flight, preserving order"""
+    pending = deque()
+    for path in paths:
+        pending.append(executor.submit(decode_image, path))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+# Output writers
+class JsonlWriter:
+    """Append results to a JSONL file; every flushed line is committed"""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load_completed(self) -> Set[str]:
+        """Return paths already scored without error, dropping a partial trailing line"""
+        if not self.path.exists():
+            return set()
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+                data = data[:data.rfind(b"\n") + 1]
+        completed = set()
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row.get("error"):
+                # Errors may be transient (file still copying, NFS hiccup); retry them
+                completed.discard(row["path"])
+            else:
+                completed.add(row["path"])
+        return completed
+
+    def open(self, overwrite: bool = False):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w" if overwrite else "a", encoding="utf-8")
+
+    def write(self, rows: List[Dict]):
+        for row in rows:
+            self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Write results as Parquet part files in a directory.
+
+    Each part is written to a temporary name and renamed once its footer is
+    written, so only complete parts are ever visible or counted as done.
+    """
+
+    def __init__(self, path: Path, rows_per_file: int = config.BULK_PARQUET_ROWS_PER_FILE):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow")
+        self._pa = pa
+        self._pq = pq
+        self.path = path
+        self.rows_per_file = rows_per_file
+        self.schema = pa.schema([
+            ("path", pa.string()),
+            ("nsfw", pa.float64()),
+            ("normal", pa.float64()),
+            ("is_nsfw", pa.bool_()),
+            ("confidence", pa.float64()),
+            ("threshold_preset", pa.string()),
+            ("error", pa.string())
+        ])
+        self._writer = None
+        self._part_rows = 0
+
+    def load_completed(self) -> Set[str]:
+        if not self.path.exists():
+            return set()
+        for tmp in self.path.glob("*.parquet.tmp"):
+            tmp.unlink()
+        completed = set()
+        for part in sorted(self.path.glob("part-*.parquet")):
+            table = self._pq.read_table(part, columns=["path", "error"])
+            for path, error in zip(table.column("path").to_pylist(), table.column("error").to_pylist()):
+                # Errors may be transient (file still copying, NFS hiccup); retry them
+                if error:
+                    completed.discard(path)
+                else:
+                    completed.add(path)
+        return completed
+
+    def open(self, overwrite: bool = False):
+        self.path.mkdir(parents=True, exist_ok=True)
+        if overwrite:
+            for part in self.path.glob("part-*.parquet*"):
+                part.unlink()
+
+    def _finish_part(self):
+        self._writer.close()
+        os.replace(self._tmp_path, self._final_path)
+        self._writer = None
+        self._part_rows = 0
+
+    def write(self, rows: List[Dict]):
+        if self._writer is None:
+            name = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{len(list(self.path.glob('part-*.parquet'))):05d}.parquet"
+            self._final_path = self.path / name
+            self._tmp_path = self.path / (name + ".tmp")
+            self._writer = self._pq.ParquetWriter(str(self._tmp_path), self.schema)
+        self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self.schema))
+        self._part_rows += len(rows)
+        if self._part_rows >= self.rows_per_file:
+            self._finish_part()
+
+    def close(self):
+        if self._writer is not None:
+            self._finish_part()
+
+
+# Scoring
+def score_batch(detector, batch: List[Tuple[str, Optional[Image.Image], Optional[str]]], threshold_preset: str) -> List[Dict]:
+    """Run one inference batch; images that failed to decode get an error row"""
+    decoded = [(path, image) for path, image, error in batch if image is not None]
+    predictions = dict(zip(
+        [path for path, _ in decoded],
+        detector.predict_batch([image for _, image in decoded])
+    ))
+
+    rows = []
+    for path, image, error in batch:
+        if path in predictions:
+            prediction = predictions[path]
+            rows.append({
+                "path": path,
+                "nsfw": prediction.get("nsfw", 0.0),
+                "normal": prediction.get("normal", 0.0),
+                "is_nsfw": detector.is_nsfw(prediction, threshold_preset),
+                "confidence": detector.get_confidence(prediction),
+                "threshold_preset": threshold_preset,
+                "error": None
+            })
+        else:
+            rows.append({
+                "path": path,
+                "nsfw": None,
+                "normal": None,
+                "is_nsfw": None,
+                "confidence": None,
+                "threshold_preset": threshold_preset,
+                "error": error
+            })
+    return rows
+
+
+def run(
+    source: Path,
+    writer,
+    threshold_preset: str = "balanced",
+    batch_size: int = config.BULK_BATCH_SIZE,
+    workers: Optional[int] = None,
+    overwrite: bool = False
+) -> Dict:
+    """
+    Score every image from `source` and stream results to `writer`
+
+    Returns:
+        Summary with counts and throughput in successfully scored images per
+        second (`processed` also includes images that failed to load)
+    """
+    # Imported here (with spawned workers below) so decode processes never load torch/transformers
+    from model_loader import detector, load_model
+
+    completed = set() if overwrite else writer.load_completed()
+    if completed:
+        logger.info(f"Resuming: skipping {len(completed)} already scored images")
+
+    load_model()
+    writer.open(overwrite=overwrite)
+
+    workers = workers or os.cpu_count() or 1
+    paths = iter_pending(iter_inputs(source), completed)
+
+    processed = 0
+    errors = 0
+    start_time = time.time()
+    last_report = start_time
+
+    try:
+        # Spawn rather than fork: forking after load_model() would copy the model
+        # and torch runtime state into every decode worker
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            batch = []
+            for item in iter_decoded(executor, paths, max_pending=batch_size * 2):
+                batch.append(item)
+                if len(batch) < batch_size:
+                    continue
+                processed += len(batch)
+                errors += _write_batch(detector, writer, batch, threshold_preset)
+                batch = []
+
+                now = time.time()
+                if now - last_report >= config.BULK_PROGRESS_INTERVAL_SECONDS:
+                    scored = processed - errors
+                    logger.info(f"Scored {scored} images ({scored / (now - start_time):.1f} images/sec), errors: {errors}")
+                    last_report = now
+
+            if batch:
+                processed += len(batch)
+                errors += _write_batch(detector, writer, batch, threshold_preset)
+    finally:
+        writer.close()
+
+    elapsed = time.time() - start_time
+    scored = processed - errors
+    return {
+        "processed": processed,
+        "scored": scored,
+        "errors": errors,
+        "skipped": len(completed),
+        "elapsed_seconds": elapsed,
+        "images_per_second": scored / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def _write_batch(detector, writer, batch: List[Tuple[str, Optional[Image.Image], Optional[str]]], threshold_preset: str) -> int:
+    """Score and write one batch; returns the number of error rows"""
+    rows = score_batch(detector, batch, threshold_preset)
+    writer.write(rows)
+    return sum(1 for row in rows if row["error"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk NSFW scoring for local images")
+    parser.add_argument("input", type=Path, help="Image directory or manifest file")
+    parser.add_argument("--output", type=Path, required=True, help="JSONL file or Parquet directory")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="Output format")
+    parser.add_argument("--threshold", choices=list(config.THRESHOLDS.keys()), default=config.DEFAULT_THRESHOLD)
+    parser.add_argument("--batch-size", type=int, default=config.BULK_BATCH_SIZE, help="Images per inference batch")
+    parser.add_argument("--workers", type=int, help="Decode processes (default: CPU count)")
+    parser.add_argument("--overwrite", action="store_true", help="Discard existing output instead of resuming")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, config.LOG_LEVEL),
+        format=config.LOG_FORMAT
+    )
+
+    try:
+        writer = ParquetWriter(args.output) if args.format == "parquet" else JsonlWriter(args.output)
+        summary = run(
+            args.input,
+            writer,
+            threshold_preset=args.threshold,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            overwrite=args.overwrite
+        )
+    except (FileNotFoundError, RuntimeError) as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    logger.info(
+        f"Done: {summary['processed']} processed ({summary['scored']} scored, {summary['errors']} errors), {summary['skipped']} skipped "
+        f"in {summary['elapsed_seconds']:.1f}s ({summary['images_per_second']:.1f} images/sec)"
+    )
+
+
+if __name__ == "__main__":
+    main()
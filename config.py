@@ -26,6 +26,23 @@ MAX_IMAGE_SIZE_BYTES = MAX_IMAGE_SIZE_MB * 1024 * 1024
 ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp", "image/bmp"}
 MAX_IMAGE_DIMENSION = 4096  # Max width or height in pixels
 
+# Video processing
+MAX_VIDEO_SIZE_MB = 100
+MAX_VIDEO_SIZE_BYTES = MAX_VIDEO_SIZE_MB * 1024 * 1024
+VIDEO_SAMPLING_MODES = ["interval", "keyframe"]
+VIDEO_DEFAULT_INTERVAL_SECONDS = 1.0  # Sample one frame per second in interval mode
+VIDEO_MAX_FRAMES = 300  # Hard cap on frames scored per video
+VIDEO_BATCH_SIZE = 8  # Frames per inference batch (bounds memory held at once)
+VIDEO_FRAME_MAX_DIMENSION = 512  # Frames are downscaled before batching
+VIDEO_SEGMENT_SECONDS = 5.0  # Length of each scored segment
+
+# Bulk scoring (offline CLI)
+BULK_BATCH_SIZE = 32  # Images per inference batch
+BULK_DECODE_MAX_DIMENSION = 512  # Decoded images are downscaled in worker processes
+BULK_PARQUET_ROWS_PER_FILE = 10000  # Rows per finished Parquet part file
+BULK_PROGRESS_INTERVAL_SECONDS = 10
+BULK_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"}
+
 # Classification thresholds
 # Binary classification: normal vs nsfw
 NSFW_CLASSES = ["normal", "nsfw"]
@@ -42,7 +59,8 @@ DEFAULT_THRESHOLD = "balanced"
 FLAG_THRESHOLD = THRESHOLDS[DEFAULT_THRESHOLD]
 
 # Rate limiting
-RATE_LIMIT_MODERATE = "60/minute"  # 60 requests per minute for /moderate
+RATE_LIMIT_MODERATE = os.getenv("RATE_LIMIT_MODERATE", "60/minute")  # 60 requests per minute for /moderate
+RATE_LIMIT_MODERATE_VIDEO = os.getenv("RATE_LIMIT_MODERATE_VIDEO", "10/minute")  # Videos are far more expensive per request
 RATE_LIMIT_HEALTH = "300/minute"   # Higher limit for health checks
 
 # Logging
@@ -57,3 +75,20 @@ RETAIN_PREDICTIONS = False  # Don't store prediction results
 # Performance
 INFERENCE_TIMEOUT_SECONDS = 30
 IMAGE_DOWNLOAD_TIMEOUT_SECONDS = 10
+
+# Overload protection (image requests)
+OVERLOAD_MAX_CONCURRENT_INFERENCES = int(os.getenv("OVERLOAD_MAX_CONCURRENT_INFERENCES", "1"))
+OVERLOAD_MAX_BATCH_SIZE = int(os.getenv("OVERLOAD_MAX_BATCH_SIZE", "8"))  # Queued images coalesced per forward pass
+OVERLOAD_MAX_QUEUE_DEPTH = int(os.getenv("OVERLOAD_MAX_QUEUE_DEPTH", "16"))  # Requests waiting for a slot
+OVERLOAD_MAX_QUEUE_WAIT_MS = float(os.getenv("OVERLOAD_MAX_QUEUE_WAIT_MS", "2000"))  # Shed beyond this wait
+OVERLOAD_DEGRADE_QUEUE_WAIT_MS = float(os.getenv("OVERLOAD_DEGRADE_QUEUE_WAIT_MS", "500"))  # Degrade beyond this wait
+
+# Overload protection (video requests, separate slots so videos never block images)
+OVERLOAD_VIDEO_MAX_CONCURRENT = int(os.getenv("OVERLOAD_VIDEO_MAX_CONCURRENT", "1"))
+OVERLOAD_VIDEO_MAX_QUEUE_DEPTH = int(os.getenv("OVERLOAD_VIDEO_MAX_QUEUE_DEPTH", "4"))
+OVERLOAD_VIDEO_MAX_QUEUE_WAIT_MS = float(os.getenv("OVERLOAD_VIDEO_MAX_QUEUE_WAIT_MS", "10000"))
+OVERLOAD_VIDEO_DEGRADE_QUEUE_WAIT_MS = float(os.getenv("OVERLOAD_VIDEO_DEGRADE_QUEUE_WAIT_MS", "3000"))
+
+OVERLOAD_EWMA_ALPHA = 0.2  # Smoothing for queue wait / inference latency averages
+OVERLOAD_STATE_WINDOW_SECONDS = 10  # Report "shedding" for this long after a shed
+OVERLOAD_RETRY_AFTER_SECONDS = 1
@@ -0,0 +1,103 @@
+"""
+Overload load test for the NSFW Detection API
+
+Measures single-request capacity, then sends open-loop traffic at a multiple
+of that capacity to /moderate and reports latency percentiles for accepted
+requests alongside the shed (503) rate.
+
+Usage:
+    python load_test.py --url http://localhost:8000 --image test_beach.jpg --overload 3
+
+Rate limiting is per IP, so start the server under test with a high limit:
+    RATE_LIMIT_MODERATE=100000/minute uvicorn main:app
+"""
+
+import argparse
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+
+def make_test_image() -> bytes:
+    """Generate a plain JPEG so the test needs no real content"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), color=(120, 160, 200)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def send(url: str, image_bytes: bytes):
+    start = time.time()
+    try:
+        response = requests.post(
+            f"{url}/moderate",
+            files={"image": ("load_test.jpg", image_bytes, "image/jpeg")},
+            timeout=60
+        )
+        status_code = response.status_code
+        batch_size = response.json().get("batch_size", 1) if status_code == 200 else 0
+    except requests.exceptions.RequestException:
+        status_code = 0
+        batch_size = 0
+    return status_code, (time.time() - start) * 1000, batch_size
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overload load test for /moderate")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--image", help="Image file to send (default: generated JPEG)")
+    parser.add_argument("--overload", type=float, default=3.0, help="Multiple of measured capacity to send")
+    parser.add_argument("--duration", type=float, default=60.0, help="Test duration in seconds")
+    parser.add_argument("--warmup", type=int, default=5, help="Sequential requests used to measure capacity")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            image_bytes = f.read()
+    else:
+        image_bytes = make_test_image()
+
+    # Measure capacity with sequential requests
+    warmup_latencies = sorted(send(args.url, image_bytes)[1] for _ in range(args.warmup))
+    capacity_rps = 1000 / percentile(warmup_latencies, 0.5)
+    target_rps = capacity_rps * args.overload
+    total_requests = int(target_rps * args.duration)
+    print(f"Measured capacity: {capacity_rps:.2f} req/s, sending {target_rps:.2f} req/s for {args.duration:.0f}s ({total_requests} requests)")
+
+    # Open-loop arrivals: submit on a fixed schedule regardless of responses
+    futures = []
+    with ThreadPoolExecutor(max_workers=max(int(target_rps * 30), 16)) as executor:
+        start = time.time()
+        for i in range(total_requests):
+            delay = start + i / target_rps - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(send, args.url, image_bytes))
+        results = [future.result() for future in futures]
+
+    accepted = sorted(latency for status_code, latency, _ in results if status_code == 200)
+    shed = [latency for status_code, latency, _ in results if status_code == 503]
+    coalesced = sum(1 for status_code, _, batch_size in results if status_code == 200 and batch_size > 1)
+    failed = len(results) - len(accepted) - len(shed)
+
+    print(f"Accepted: {len(accepted)} ({coalesced} in coalesced batches), shed (503): {len(shed)}, other errors: {failed}")
+    print(f"Accepted latency ms: p50={percentile(accepted, 0.5):.0f} p95={percentile(accepted, 0.95):.0f} p99={percentile(accepted, 0.99):.0f}")
+    if shed:
+        print(f"Shed latency ms: p99={percentile(sorted(shed), 0.99):.0f}")
+    try:
+        overload = requests.get(f"{args.url}/status", timeout=10).json().get("overload")
+        print(f"Server overload status: {overload}")
+    except requests.exceptions.RequestException as e:
+        print(f"Server status unavailable after test: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ import logging
 import asyncio
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 import time
 import io
 import uuid
@@ -25,7 +25,9 @@ import requests
 from PIL import Image
 
 import config
-from model_loader import load_model, predict_nsfw
+from model_loader import load_model, predict_nsfw_batch
+from overload import OverloadController, OverloadedError
+from video_processor import moderate_videos
 
 logging.basicConfig(
     level=getattr(logging, config.LOG_LEVEL),
@@ -66,6 +68,21 @@ class Metrics:
 
 metrics = Metrics()
 
+# Separate slot pools so a long video never holds up image requests
+image_controller = OverloadController(
+    "image",
+    predict_nsfw_batch,
+    max_batch_size=config.OVERLOAD_MAX_BATCH_SIZE
+)
+video_controller = OverloadController(
+    "video",
+    moderate_videos,
+    max_concurrent=config.OVERLOAD_VIDEO_MAX_CONCURRENT,
+    max_queue_depth=config.OVERLOAD_VIDEO_MAX_QUEUE_DEPTH,
+    max_queue_wait_ms=config.OVERLOAD_VIDEO_MAX_QUEUE_WAIT_MS,
+    degrade_queue_wait_ms=config.OVERLOAD_VIDEO_DEGRADE_QUEUE_WAIT_MS
+)
+
 
 # Request/Response Models
 class ImageURLRequest(BaseModel):
@@ -123,6 +140,7 @@ class ModerationResponse(BaseModel):
     threshold_preset: str = Field(..., description="Threshold preset used (strict/balanced/permissive)")
     
     # Metadata
+    batch_size: int = Field(1, description="Images scored together in this forward pass (>1 when queued requests were coalesced under load)")
     processing_time_ms: float = Field(..., description="Processing time in milliseconds")
     request_id: str = Field(..., description="Unique request ID for tracking")
     
@@ -135,12 +153,45 @@ class ModerationResponse(BaseModel):
                 "confidence": 0.87,
                 "threshold_used": 0.5,
                 "threshold_preset": "balanced",
+                "batch_size": 1,
                 "processing_time_ms": 245.3,
                 "request_id": "550e8400-e29b-41d4-a716-446655440000"
             }
         }
 
 
+class VideoSegment(BaseModel):
+    """Scores for one fixed-length segment of a video"""
+    start_seconds: float = Field(..., description="Segment start time in seconds")
+    end_seconds: float = Field(..., description="Segment end time in seconds")
+    frames: int = Field(..., description="Number of sampled frames scored in this segment")
+    max_nsfw: float = Field(..., ge=0.0, le=1.0, description="Highest frame NSFW probability in the segment")
+    mean_nsfw: float = Field(..., ge=0.0, le=1.0, description="Mean frame NSFW probability in the segment")
+    is_nsfw: bool = Field(..., description="True if any frame in the segment crossed the threshold")
+
+
+class VideoModerationResponse(BaseModel):
+    """Response model for video NSFW detection results"""
+    nsfw: float = Field(..., ge=0.0, le=1.0, description="Highest NSFW probability across sampled frames")
+    is_nsfw: bool = Field(..., description="True if any sampled frame is classified as NSFW")
+    flagged_at_seconds: Optional[float] = Field(None, description="Timestamp of the first frame over the threshold")
+    frames_analyzed: int = Field(..., description="Number of sampled frames scored")
+    terminated_early: bool = Field(..., description="True if decoding stopped at the first NSFW frame")
+    truncated: bool = Field(..., description="True if the frame cap was reached before the end of the video")
+    coverage_seconds: float = Field(..., description="Timestamp of the last scored frame; later content was not checked")
+    sampling: str = Field(..., description="Frame sampling mode used (interval/keyframe)")
+    segments: List[VideoSegment] = Field(..., description="Per-segment scores in time order")
+    
+    # Threshold information
+    threshold_used: float = Field(..., description="Threshold value used for classification")
+    threshold_preset: str = Field(..., description="Threshold preset used (strict/balanced/permissive)")
+    
+    # Metadata
+    degraded: bool = Field(False, description="True if keyframe sampling was forced due to load")
+    processing_time_ms: float = Field(..., description="Processing time in milliseconds")
+    request_id: str = Field(..., description="Unique request ID for tracking")
+
+
 # Lifespan management
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -205,6 +256,18 @@ async def download_image(url: str) -> bytes:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+async def run_inference(controller: OverloadController, item, degraded: bool = False):
+    """Run inference through an overload controller, shedding with 503"""
+    try:
+        return await controller.run(item, degraded=degraded)
+    except OverloadedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(config.OVERLOAD_RETRY_AFTER_SECONDS)}
+        )
+
+
 def validate_image(image_bytes: bytes) -> None:
     """Validate image data"""
     # Check size
@@ -289,7 +352,14 @@ async def status():
         "limits": {
             "max_image_size_mb": config.MAX_IMAGE_SIZE_MB,
             "max_dimensions": config.MAX_IMAGE_DIMENSION,
-            "rate_limit_moderate": config.RATE_LIMIT_MODERATE
+            "rate_limit_moderate": config.RATE_LIMIT_MODERATE,
+            "max_video_size_mb": config.MAX_VIDEO_SIZE_MB,
+            "max_video_frames": config.VIDEO_MAX_FRAMES,
+            "rate_limit_moderate_video": config.RATE_LIMIT_MODERATE_VIDEO
+        },
+        "overload": {
+            "image": image_controller.get_status(),
+            "video": video_controller.get_status()
         }
     }
 
@@ -306,7 +376,9 @@ async def get_metrics():
         "error_count": metrics.error_count,
         "error_rate": metrics.error_count / metrics.request_count if metrics.request_count > 0 else 0,
         "requests_per_second": metrics.request_count / uptime if uptime > 0 else 0,
-        "latency_ms": latency_stats
+        "latency_ms": latency_stats,
+        "shed_count": image_controller.shed_count + video_controller.shed_count,
+        "degraded_count": video_controller.degraded_count
     }
 
 
@@ -358,7 +430,7 @@ async def moderate_image_file(
         
         # Run inference
         logger.info(f"[{request_id}] Processing image: {image.filename} ({len(image_bytes)} bytes), threshold: {threshold}")
-        results = predict_nsfw(image_bytes, threshold_preset=threshold)
+        results = await run_inference(image_controller, (image_bytes, threshold))
         
         # Record metrics
         elapsed_ms = (time.time() - start_time) * 1000
@@ -431,7 +503,7 @@ async def moderate_image_url(
         
         # Run inference
         logger.info(f"[{request_id}] Processing downloaded image ({len(image_bytes)} bytes), threshold: {threshold}")
-        results = predict_nsfw(image_bytes, threshold_preset=threshold)
+        results = await run_inference(image_controller, (image_bytes, threshold))
         
         # Record metrics
         elapsed_ms = (time.time() - start_time) * 1000
@@ -458,6 +530,119 @@ async def moderate_image_url(
         raise HTTPException(status_code=500, detail=f"Moderation error: {str(e)}")
 
 
+# Video moderation endpoint - File upload
+@app.post("/moderate-video", response_model=VideoModerationResponse)
+@limiter.limit(config.RATE_LIMIT_MODERATE_VIDEO)
+async def moderate_video_file(
+    request: Request,
+    video: UploadFile = File(..., description="Video file to moderate"),
+    threshold: str = "balanced",
+    sampling: str = "interval",
+    interval_seconds: float = config.VIDEO_DEFAULT_INTERVAL_SECONDS,
+    stop_on_nsfw: bool = True
+):
+    """
+    Moderate an uploaded video for NSFW content.
+    
+    The video is decoded as a stream and sampled frames are scored in batches,
+    so memory stays bounded regardless of video length.
+    
+    **Privacy Guarantee**: Videos are processed as a temporary upload stream only
+    and NEVER stored. No frame data is logged or retained after processing.
+    
+    **Sampling**:
+    - `interval`: One frame every `interval_seconds` (default 1.0)
+    - `keyframe`: Only keyframes (I-frames) are decoded, fastest
+    
+    **Early termination**: With `stop_on_nsfw=true` (default), decoding stops
+    after the first batch containing a frame over the threshold.
+    
+    **Rate limit**: 10 requests per minute per IP
+    **Max file size**: 100MB
+    **Max sampled frames**: 300 (longer videos return `truncated: true` and
+    `coverage_seconds` marks how far the video was checked)
+    
+    **Returns**: Overall classification plus per-segment scores and unique request ID
+    """
+    start_time = time.time()
+    is_error = False
+    request_id = str(uuid.uuid4())
+    
+    try:
+        # Validate parameters
+        if threshold not in config.THRESHOLDS:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Invalid threshold. Must be one of: {list(config.THRESHOLDS.keys())}"
+            )
+        if sampling not in config.VIDEO_SAMPLING_MODES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid sampling. Must be one of: {config.VIDEO_SAMPLING_MODES}"
+            )
+        if interval_seconds <= 0:
+            raise HTTPException(status_code=400, detail="interval_seconds must be positive")
+        
+        # Check size without reading the upload into memory
+        video.file.seek(0, io.SEEK_END)
+        video_size = video.file.tell()
+        video.file.seek(0)
+        if video_size > config.MAX_VIDEO_SIZE_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Video too large: {video_size} bytes (max: {config.MAX_VIDEO_SIZE_MB}MB)"
+            )
+        
+        # Under load (videos share the CPU with images), fall back to the cheapest sampling mode
+        degraded = (
+            video_controller.is_degraded() or image_controller.is_degraded()
+        ) and sampling != "keyframe"
+        if degraded:
+            sampling = "keyframe"
+        
+        # Run inference
+        logger.info(f"[{request_id}] Processing video: {video.filename} ({video_size} bytes), threshold: {threshold}, sampling: {sampling}")
+        try:
+            results = await run_inference(
+                video_controller,
+                {
+                    "source": video.file,
+                    "threshold_preset": threshold,
+                    "sampling": sampling,
+                    "interval_seconds": interval_seconds,
+                    "stop_on_nsfw": stop_on_nsfw
+                },
+                degraded=degraded
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # Record metrics
+        elapsed_ms = (time.time() - start_time) * 1000
+        metrics.record_request(elapsed_ms, is_error)
+        
+        # Add metadata
+        results['degraded'] = degraded
+        results['processing_time_ms'] = elapsed_ms
+        results['request_id'] = request_id
+        
+        logger.info(f"[{request_id}] Video inference completed in {elapsed_ms:.2f}ms. Frames: {results['frames_analyzed']}, NSFW: {results['is_nsfw']}")
+        
+        return results
+        
+    except HTTPException:
+        is_error = True
+        elapsed_ms = (time.time() - start_time) * 1000
+        metrics.record_request(elapsed_ms, is_error)
+        raise
+    except Exception as e:
+        is_error = True
+        elapsed_ms = (time.time() - start_time) * 1000
+        metrics.record_request(elapsed_ms, is_error)
+        logger.error(f"[{request_id}] Video moderation error: {e}")
+        raise HTTPException(status_code=500, detail=f"Moderation error: {str(e)}")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -8,7 +8,7 @@ from PIL import Image
 from transformers import AutoModelForImageClassification, AutoFeatureExtractor
 from pathlib import Path
 import io
-from typing import Dict, Union
+from typing import Dict, List, Tuple, Union
 
 import config
 
@@ -82,42 +82,60 @@ class NSFWDetector:
             # Load image
             image = Image.open(io.BytesIO(image_bytes))
             
-            # Convert to RGB if needed (handle RGBA, grayscale, etc.)
-            if image.mode != "RGB":
-                image = image.convert("RGB")
-            
-            # Preprocess image
-            inputs = self.feature_extractor(images=image, return_tensors="pt")
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Run inference
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                logits = outputs.logits
-                probabilities = torch.nn.functional.softmax(logits, dim=-1)
-            
-            # Convert to dict - Binary classification
-            probs = probabilities[0].cpu().numpy()
-            results = {}
-            
-            # Map to binary classes (normal/nsfw)
-            for idx, prob in enumerate(probs):
-                label = self.labels.get(idx, f"class_{idx}")
-                label = label.lower().replace(" ", "_")
-                results[label] = float(prob)
-            
-            # Ensure we have both classes
-            if "normal" not in results:
-                results["normal"] = 1.0 - results.get("nsfw", 0.0)
-            if "nsfw" not in results:
-                results["nsfw"] = 1.0 - results.get("normal", 0.0)
-            
-            return results
+            return self.predict_batch([image])[0]
             
         except Exception as e:
             logger.error(f"Prediction error: {e}")
             raise
     
+    def predict_batch(self, images: List[Image.Image]) -> List[Dict[str, float]]:
+        """
+        Predict NSFW content for several decoded images in one forward pass
+        
+        Args:
+            images: PIL images (any mode, converted to RGB as needed)
+            
+        Returns:
+            List of normal/nsfw probability dicts, one per image, in input order
+        """
+        if self.model is None:
+            raise RuntimeError("Model not loaded. Call load_model() first.")
+        
+        if not images:
+            return []
+        
+        # Convert to RGB if needed (handle RGBA, grayscale, etc.)
+        images = [image if image.mode == "RGB" else image.convert("RGB") for image in images]
+        
+        # Preprocess images
+        inputs = self.feature_extractor(images=images, return_tensors="pt")
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        
+        # Run inference
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+            logits = outputs.logits
+            probabilities = torch.nn.functional.softmax(logits, dim=-1)
+        
+        return [self._to_results(probs) for probs in probabilities.cpu().numpy()]
+    
+    def _to_results(self, probs) -> Dict[str, float]:
+        """Map one row of class probabilities to binary classes (normal/nsfw)"""
+        results = {}
+        
+        for idx, prob in enumerate(probs):
+            label = self.labels.get(idx, f"class_{idx}")
+            label = label.lower().replace(" ", "_")
+            results[label] = float(prob)
+        
+        # Ensure we have both classes
+        if "normal" not in results:
+            results["normal"] = 1.0 - results.get("nsfw", 0.0)
+        if "nsfw" not in results:
+            results["nsfw"] = 1.0 - results.get("normal", 0.0)
+        
+        return results
+    
     def is_nsfw(self, predictions: Dict[str, float], threshold_preset: str = "balanced") -> bool:
         """
         Check if content is NSFW based on configurable threshold
@@ -164,7 +182,40 @@ def predict_nsfw(image_bytes: bytes, threshold_preset: str = "balanced") -> Dict
         Dictionary with predictions, classification, and confidence
     """
     predictions = detector.predict(image_bytes, threshold_preset)
+    return _build_result(predictions, threshold_preset)
+
+
+def predict_nsfw_batch(requests: List[Tuple[bytes, str]]) -> List[Union[Dict, Exception]]:
+    """
+    Predict NSFW content for several images in one forward pass
     
+    Args:
+        requests: (image_bytes, threshold_preset) pairs
+        
+    Returns:
+        One result dict per request (as from predict_nsfw, plus `batch_size`),
+        or the exception raised while decoding that image
+    """
+    results = [None] * len(requests)
+    decoded = []
+    for index, (image_bytes, _) in enumerate(requests):
+        try:
+            image = Image.open(io.BytesIO(image_bytes))
+            image.load()
+            decoded.append((index, image))
+        except Exception as e:
+            results[index] = e
+    
+    predictions = detector.predict_batch([image for _, image in decoded])
+    for (index, _), prediction in zip(decoded, predictions):
+        results[index] = _build_result(prediction, requests[index][1])
+        results[index]["batch_size"] = len(decoded)
+    
+    return results
+
+
+def _build_result(predictions: Dict[str, float], threshold_preset: str) -> Dict:
+    """Add classification, confidence and threshold info to raw probabilities"""
     is_nsfw = detector.is_nsfw(predictions, threshold_preset)
     confidence = detector.get_confidence(predictions)
     
@@ -0,0 +1,227 @@
+"""
+Overload controller: bounded inference queue with load shedding and batching
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class OverloadedError(Exception):
+    """Raised when a request is shed instead of queued"""
+
+
+class _QueuedItem:
+    """One request waiting for (or holding) an inference slot"""
+
+    def __init__(self, item: Any, loop: asyncio.AbstractEventLoop):
+        self.item = item
+        self.queued_at = time.monotonic()
+        self.started = loop.create_future()
+        self.result = loop.create_future()
+
+
+class OverloadController:
+    """
+    Admit inference work into a fixed number of slots.
+
+    Requests queue for a slot; whenever a slot frees up, every waiting item
+    (up to `max_batch_size`) is taken together and passed to `batch_func` in
+    one call, which runs in a worker thread. Under load this coalesces queued
+    images into a single forward pass, so throughput rises as the queue
+    grows. Requests are shed immediately when the queue is full or the
+    estimated wait (from measured per-item latency) exceeds the limit, and
+    shed after waiting if no slot frees up in time.
+
+    Use one controller per workload so slow jobs (videos) neither hold the
+    slots of fast ones (images) nor skew their latency estimate.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_func: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 1,
+        max_concurrent: int = config.OVERLOAD_MAX_CONCURRENT_INFERENCES,
+        max_queue_depth: int = config.OVERLOAD_MAX_QUEUE_DEPTH,
+        max_queue_wait_ms: float = config.OVERLOAD_MAX_QUEUE_WAIT_MS,
+        degrade_queue_wait_ms: float = config.OVERLOAD_DEGRADE_QUEUE_WAIT_MS
+    ):
+        if max_concurrent < 1:
+            raise ValueError(f"{name}: max_concurrent must be at least 1")
+        if max_queue_depth < 1:
+            raise ValueError(f"{name}: max_queue_depth must be at least 1")
+        if max_batch_size < 1:
+            raise ValueError(f"{name}: max_batch_size must be at least 1")
+
+        self.name = name
+        self.batch_func = batch_func
+        self.max_batch_size = max_batch_size
+        self.max_concurrent = max_concurrent
+        self.max_queue_depth = max_queue_depth
+        self.max_queue_wait_ms = max_queue_wait_ms
+        self.degrade_queue_wait_ms = degrade_queue_wait_ms
+        self.in_flight = 0
+        self.queue_wait_ms = 0.0
+        self.item_ms = 0.0
+        self.admitted_count = 0
+        self.batch_count = 0
+        self.shed_count = 0
+        self.degraded_count = 0
+        self.last_shed_time = None
+        self._pending = deque()
+        self._semaphore = None
+        self._dispatcher = None
+        self._batch_tasks = set()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._pending)
+
+    def oldest_wait_ms(self) -> float:
+        """How long the oldest queued request has been waiting (0 if none)"""
+        if not self._pending:
+            return 0.0
+        return (time.monotonic() - self._pending[0].queued_at) * 1000
+
+    def is_degraded(self) -> bool:
+        """
+        True if callers should switch to cheaper processing
+
+        Based on the live queue rather than the queue-wait average, which only
+        moves when requests arrive and would stay high after a spike.
+        """
+        return (
+            self.oldest_wait_ms() >= self.degrade_queue_wait_ms
+            or self.waiting >= max(1, self.max_queue_depth // 2)
+        )
+
+    def get_state(self) -> str:
+        if self.last_shed_time is not None and time.monotonic() - self.last_shed_time < config.OVERLOAD_STATE_WINDOW_SECONDS:
+            return "shedding"
+        if self.is_degraded():
+            return "degraded"
+        return "normal"
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "state": self.get_state(),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_batch_size": self.max_batch_size,
+            "max_queue_depth": self.max_queue_depth,
+            "max_queue_wait_ms": self.max_queue_wait_ms,
+            "oldest_wait_ms": round(self.oldest_wait_ms(), 2),
+            "queue_wait_ms_avg": round(self.queue_wait_ms, 2),
+            "item_ms_avg": round(self.item_ms, 2),
+            "avg_batch_size": round(self.admitted_count / self.batch_count, 2) if self.batch_count else 0.0,
+            "admitted_count": self.admitted_count,
+            "shed_count": self.shed_count,
+            "degraded_count": self.degraded_count
+        }
+
+    def _update(self, current: float, sample: float) -> float:
+        if current == 0.0:
+            return sample
+        return (1 - config.OVERLOAD_EWMA_ALPHA) * current + config.OVERLOAD_EWMA_ALPHA * sample
+
+    def _shed(self, reason: str):
+        self.shed_count += 1
+        self.last_shed_time = time.monotonic()
+        logger.warning(f"Shedding {self.name} request: {reason}")
+        raise OverloadedError(f"Server overloaded ({reason}), retry later")
+
+    async def run(self, item: Any, degraded: bool = False) -> Any:
+        """
+        Queue one item and return its result from `batch_func`
+
+        Args:
+            item: Work item passed (inside a list) to `batch_func`
+            degraded: Whether the caller chose a degraded mode (for accounting)
+
+        Raises:
+            OverloadedError: If the request was shed
+            Exception: Whatever `batch_func` raised or returned for this item
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        # Fast rejection before queueing
+        if self.waiting >= self.max_queue_depth:
+            self._shed("queue full")
+        if self.in_flight >= self.max_concurrent:
+            estimated_wait_ms = (self.waiting + 1) * self.item_ms / self.max_concurrent
+            if estimated_wait_ms > self.max_queue_wait_ms:
+                self._shed(f"estimated wait {estimated_wait_ms:.0f}ms")
+
+        queued = _QueuedItem(item, loop)
+        self._pending.append(queued)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            await asyncio.wait_for(asyncio.shield(queued.started), timeout=self.max_queue_wait_ms / 1000)
+        except asyncio.TimeoutError:
+            if queued in self._pending:
+                self._pending.remove(queued)
+                # A timed-out wait is the strongest overload signal, so it counts toward the reported average
+                self.queue_wait_ms = self._update(self.queue_wait_ms, (time.monotonic() - queued.queued_at) * 1000)
+                self._shed("queue wait timeout")
+        except asyncio.CancelledError:
+            # Client went away while queued; don't spend a slot on it
+            if queued in self._pending:
+                self._pending.remove(queued)
+            raise
+
+        if degraded:
+            self.degraded_count += 1
+        return await queued.result
+
+    async def _dispatch(self):
+        """Hand queued items to free slots, batching everything that waited"""
+        while self._pending:
+            await self._semaphore.acquire()
+            if not self._pending:
+                self._semaphore.release()
+                break
+
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch_size, len(self._pending)))]
+            now = time.monotonic()
+            for queued in batch:
+                self.queue_wait_ms = self._update(self.queue_wait_ms, (now - queued.queued_at) * 1000)
+                queued.started.set_result(None)
+
+            self.in_flight += 1
+            self.admitted_count += len(batch)
+            self.batch_count += 1
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[_QueuedItem]):
+        started_at = time.monotonic()
+        try:
+            results = await asyncio.to_thread(self.batch_func, [queued.item for queued in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            self.item_ms = self._update(self.item_ms, (time.monotonic() - started_at) * 1000 / len(batch))
+            self.in_flight -= 1
+            self._semaphore.release()
+
+        for queued, result in zip(batch, results):
+            if queued.result.done():
+                # Caller was cancelled while its batch ran; the others still need results
+                continue
+            if isinstance(result, Exception):
+                queued.result.set_exception(result)
+            else:
+                queued.result.set_result(result)
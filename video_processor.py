@@ -0,0 +1,231 @@
+"""
+Video moderation via streaming frame sampling and batched inference
+"""
+
+import logging
+from fractions import Fraction
+from itertools import islice
+from typing import BinaryIO, Dict, Iterator, List, Tuple, Union
+
+import av
+import numpy as np
+from PIL import Image
+
+import config
+from model_loader import detector
+
+logger = logging.getLogger(__name__)
+
+
+def iter_sampled_frames(
+    source: Union[str, BinaryIO],
+    sampling: str = "interval",
+    interval_seconds: float = config.VIDEO_DEFAULT_INTERVAL_SECONDS
+) -> Iterator[Tuple[float, Image.Image]]:
+    """
+    Decode a video lazily and yield sampled frames
+
+    Frames are decoded one at a time and discarded unless sampled, so memory
+    does not grow with video length.
+
+    Args:
+        source: Path or seekable file object containing the video
+        sampling: "keyframe" (only I-frames are decoded) or "interval"
+        interval_seconds: Spacing between sampled frames in interval mode
+
+    Yields:
+        (timestamp_seconds, downscaled RGB PIL image) pairs
+    """
+    if sampling not in config.VIDEO_SAMPLING_MODES:
+        raise ValueError(f"Sampling must be one of: {config.VIDEO_SAMPLING_MODES}")
+    if interval_seconds <= 0:
+        raise ValueError("interval_seconds must be positive")
+
+    try:
+        with av.open(source, mode="r") as container:
+            if not container.streams.video:
+                raise ValueError("No video stream found")
+
+            stream = container.streams.video[0]
+            stream.thread_type = "AUTO"
+            if sampling == "keyframe":
+                # Let the decoder drop everything except keyframes
+                stream.codec_context.skip_frame = "NONKEY"
+
+            fps = float(stream.average_rate) if stream.average_rate else 0.0
+            next_timestamp = 0.0
+
+            for index, frame in enumerate(container.decode(stream)):
+                if frame.time is not None:
+                    timestamp = float(frame.time)
+                else:
+                    timestamp = index / fps if fps else float(index)
+
+                if sampling == "interval":
+                    if timestamp < next_timestamp:
+                        continue
+                    while next_timestamp <= timestamp:
+                        next_timestamp += interval_seconds
+
+                image = frame.to_image()
+                image.thumbnail((config.VIDEO_FRAME_MAX_DIMENSION, config.VIDEO_FRAME_MAX_DIMENSION))
+                yield timestamp, image
+    except av.error.FFmpegError as e:
+        raise ValueError(f"Invalid video file: {e}")
+
+
+def _batched(frames: Iterator[Tuple[float, Image.Image]], size: int) -> Iterator[List[Tuple[float, Image.Image]]]:
+    """Group sampled frames into lists of at most `size`"""
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def moderate_video(
+    source: Union[str, BinaryIO],
+    threshold_preset: str = "balanced",
+    sampling: str = "interval",
+    interval_seconds: float = config.VIDEO_DEFAULT_INTERVAL_SECONDS,
+    stop_on_nsfw: bool = True,
+    max_frames: int = config.VIDEO_MAX_FRAMES
+) -> Dict:
+    """
+    Score a video by running sampled frames through the detector in batches
+
+    Args:
+        source: Path or seekable file object containing the video
+        threshold_preset: Threshold preset (strict/balanced/permissive)
+        sampling: "keyframe" or "interval"
+        interval_seconds: Spacing between sampled frames in interval mode
+        stop_on_nsfw: Stop decoding once any frame crosses the threshold
+        max_frames: Score at most this many sampled frames
+
+    Returns:
+        Dictionary with overall classification and per-segment scores.
+        `truncated` is True if sampled frames remained past `max_frames`;
+        `coverage_seconds` is the timestamp of the last scored frame.
+    """
+    threshold = config.THRESHOLDS.get(threshold_preset, config.THRESHOLDS["balanced"])
+    segment_seconds = config.VIDEO_SEGMENT_SECONDS
+
+    segments = {}
+    frames_analyzed = 0
+    max_nsfw = 0.0
+    flagged_at = None
+    coverage = 0.0
+    terminated_early = False
+    truncated = False
+
+    frames = iter_sampled_frames(source, sampling, interval_seconds)
+    try:
+        for batch in _batched(islice(frames, max_frames), config.VIDEO_BATCH_SIZE):
+            predictions = detector.predict_batch([image for _, image in batch])
+
+            for (timestamp, _), prediction in zip(batch, predictions):
+                nsfw = prediction.get("nsfw", 0.0)
+                frames_analyzed += 1
+                coverage = max(coverage, timestamp)
+                max_nsfw = max(max_nsfw, nsfw)
+                if flagged_at is None and nsfw >= threshold:
+                    flagged_at = timestamp
+
+                index = int(timestamp // segment_seconds)
+                segment = segments.setdefault(index, {"frames": 0, "max_nsfw": 0.0, "sum_nsfw": 0.0})
+                segment["frames"] += 1
+                segment["max_nsfw"] = max(segment["max_nsfw"], nsfw)
+                segment["sum_nsfw"] += nsfw
+
+            if stop_on_nsfw and flagged_at is not None:
+                terminated_early = True
+                logger.info(f"Stopping early: frame at {flagged_at:.2f}s crossed threshold {threshold}")
+                break
+        else:
+            # The cap was hit if the decoder still has a sampled frame to give
+            if frames_analyzed >= max_frames and next(frames, None) is not None:
+                truncated = True
+                logger.warning(f"Video truncated at {max_frames} sampled frames ({coverage:.2f}s checked)")
+    finally:
+        # Release the container and decoder threads even if inference fails
+        frames.close()
+
+    return {
+        "nsfw": max_nsfw,
+        "is_nsfw": flagged_at is not None,
+        "flagged_at_seconds": flagged_at,
+        "frames_analyzed": frames_analyzed,
+        "terminated_early": terminated_early,
+        "truncated": truncated,
+        "coverage_seconds": coverage,
+        "sampling": sampling,
+        "segments": [
+            {
+                "start_seconds": index * segment_seconds,
+                "end_seconds": (index + 1) * segment_seconds,
+                "frames": segment["frames"],
+                "max_nsfw": segment["max_nsfw"],
+                "mean_nsfw": segment["sum_nsfw"] / segment["frames"],
+                "is_nsfw": segment["max_nsfw"] >= threshold
+            }
+            for index, segment in sorted(segments.items())
+        ],
+        "threshold_used": threshold,
+        "threshold_preset": threshold_preset
+    }
+
+
+def moderate_videos(jobs: List[Dict]) -> List[Dict]:
+    """Run moderate_video for each job's keyword arguments (batch adapter for OverloadController)"""
+    return [moderate_video(**job) for job in jobs]
+
+
+def write_synthetic_video(
+    path: str,
+    duration_seconds: float = 10.0,
+    fps: int = 10,
+    size: Tuple[int, int] = (64, 64),
+    keyframe_interval: int = 10
+) -> str:
+    """
+    Write a small synthetic test video (a cycling colour gradient) to `path`
+
+    Useful as an offline fixture for exercising /moderate-video without
+    real user content.
+
+    Args:
+        path: Output file path (container inferred from extension, e.g. .mp4)
+        duration_seconds: Video length
+        fps: Frames per second
+        size: (width, height) in pixels
+        keyframe_interval: Frames between keyframes (GOP size)
+
+    Returns:
+        The path written
+    """
+    width, height = size
+    total_frames = int(duration_seconds * fps)
+    gradient = np.linspace(0, 255, width, dtype=np.uint8)[None, :].repeat(height, axis=0)
+
+    with av.open(path, mode="w") as container:
+        stream = container.add_stream("mpeg4", rate=fps)
+        stream.width = width
+        stream.height = height
+        stream.pix_fmt = "yuv420p"
+        stream.codec_context.gop_size = keyframe_interval
+        stream.codec_context.time_base = Fraction(1, fps)
+
+        for index in range(total_frames):
+            shift = (index * 255 // max(total_frames, 1)) % 256
+            pixels = np.stack([gradient, np.roll(gradient, shift, axis=1), 255 - gradient], axis=-1)
+            frame = av.VideoFrame.from_ndarray(pixels, format="rgb24")
+            for packet in stream.encode(frame):
+                container.mux(packet)
+
+        for packet in stream.encode():
+            container.mux(packet)
+
+    return path